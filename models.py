@@ -22,19 +22,47 @@ References:
 
 # Standard Library
 import os
+import atexit
+import tempfile
+import hashlib
+import glob
+import re
 
 # Gensim Model Related
 import multiprocessing
 import logging
 import time
-import dill
 from gensim.models import Word2Vec
 from gensim.models.callbacks import CallbackAny2Vec
 from contextlib import contextmanager
 
+# Corpus Preprocessing
+import numpy as np
+import numba
+from array import array
+
 # Misc
-import json
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+try:
+    import ijson
+    if ijson.backend != 'yajl2_c':
+        ijson = None # The pure Python backends are slower than decoding whole files with orjson
+except ImportError:
+    ijson = None
+if simdjson is None and ijson is None:
+    # Fall back to orjson, which is still far faster than the json module
+    import orjson
+from collections import OrderedDict
+from functools import lru_cache
+from bisect import bisect_left
 from abc import ABC, abstractmethod
+try:
+    import readline
+except ImportError:
+    readline = None # Not available on Windows, where prompts just go without tab completion
 
 
 
@@ -42,19 +70,295 @@ from abc import ABC, abstractmethod
 class Playlists(object):
     """
     This class stores Playlist data and streams it lazily, one playlist at a time, which
-    allows the model to be trained on very large datasets.
+    allows the model to be trained on very large datasets. If 'binary' is the prefix of a
+    binary corpus (see buildBinaryCorpus()), the playlists are read from it instead of
+    parsing the JSON files in 'dirname'.
     """
-    def __init__(self, dirname, feature):
+    def __init__(self, dirname, feature, binary=None):
         self.dirname = dirname
         
         # Feature is the feature that we training on ('artist_name', 'track_name')
         self.feature = feature
+        self.binary = binary
+
+        # (corpus_file, total_words) once the playlists have been written out by getCorpusFile()
+        self.corpus = None
     
     def __iter__(self):
-        for fname in os.listdir(self.dirname):
-            data = json.load(open(os.path.join(self.dirname, fname)))
-            for p in data['playlists']:
-                yield [t[self.feature] for t in p['tracks']]
+        if self.binary is not None:
+            tokens, offsets, vocab = loadBinaryCorpus(self.binary)
+            for p in range(len(offsets) - 1):
+                yield [vocab[i] for i in tokens[offsets[p]:offsets[p + 1]].tolist()]
+            return
+        # Each iteration gets its own simdjson parser, reused across its files to avoid
+        # reallocation. Sharing one between iterations fails while another is still running
+        parser = simdjson.Parser() if simdjson is not None else None
+        for path in self.paths():
+            yield from self.readFile(path, parser)
+
+    def paths(self):
+        """ Returns the paths of the JSON files holding the playlists. """
+        return [entry.path for entry in os.scandir(self.dirname) if entry.is_file()]
+
+    def readFile(self, path, parser=None):
+        """
+        Lazily yields the playlists in the JSON file at 'path', parsing it with the simdjson
+        'parser' if given. With simdjson or ijson, only the 'feature' field of each track is
+        ever converted to a Python object; the rest of the document is skipped. Otherwise the
+        file is decoded in full by orjson.
+        """
+        if parser is None and ijson is not None:
+            with open(path, 'rb') as f:
+                yield from self.streamPlaylists(f)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        doc = parser.parse(data) if parser is not None else orjson.loads(data)
+        # The parser can only be reused once 'doc' is released, which happens when this
+        # generator finishes
+        for p in doc['playlists']:
+            yield [t[self.feature] for t in p['tracks']]
+
+    def streamPlaylists(self, f):
+        """
+        Yields the playlists in the JSON file 'f' from its ijson parse events, starting a new
+        playlist at each tracks array and only keeping the values of the 'feature' fields.
+        """
+        feature_prefix = 'playlists.item.tracks.item.' + self.feature
+        playlist = None
+        for prefix, event, value in ijson.parse(f):
+            if prefix == feature_prefix:
+                playlist.append(value)
+            elif prefix == 'playlists.item.tracks':
+                if event == 'start_array':
+                    playlist = []
+                elif event == 'end_array':
+                    yield playlist
+
+class ShardedPlaylists(Playlists):
+    """
+    This class streams the playlists from an explicit list of files rather than a whole folder,
+    so that a dataset can be split into shards that are processed in parallel.
+    """
+    def __init__(self, filenames, feature):
+        super().__init__(None, feature)
+        self.filenames = filenames
+
+    def paths(self):
+        return self.filenames
+
+
+
+########## CORPUS FILE ##########
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'musicvec_cache')
+
+# Gensim's corpus_file reader splits tokens on whitespace (and lines on newlines), so any
+# whitespace inside tokens (such as the spaces in artist names) is escaped on disk and in the
+# vocab while training. Each whitespace character, and the backslash used as the escape
+# character itself, is written as '\u' followed by its 4 hex digit code point, which makes
+# the escape reversible for every token
+ESCAPED_CHARS = re.compile(r'[\s\\]')
+ESCAPE_SEQUENCE = re.compile(r'\\u([0-9a-f]{4})')
+
+def encodeToken(token):
+    return ESCAPED_CHARS.sub(lambda m: f'\\u{ord(m.group()):04x}', token)
+
+def decodeToken(token):
+    return ESCAPE_SEQUENCE.sub(lambda m: chr(int(m.group(1), 16)), token)
+
+def renameVocab(model, func):
+    """ Applies 'func' to every key in the vocab of 'model'. """
+    model.wv.index_to_key = [func(key) for key in model.wv.index_to_key]
+    model.wv.key_to_index = {key: i for i, key in enumerate(model.wv.index_to_key)}
+
+def removeFile(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Binary corpora are kept between runs, since the playlist data they are built from is immutable
+BINARY_CORPUS_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'musicvec')
+
+# Files making up a binary corpus, appended to its prefix
+BINARY_CORPUS_SUFFIXES = ('.tokens.npy', '.offsets.npy', '.vocab.npy', '.vocab_offsets.npy')
+
+# Number of playlists converted to text at a time when writing a corpus file
+PLAYLISTS_PER_CHUNK = 10000
+
+def packPlaylists(playlists):
+    """
+    Interns the tokens in 'playlists' against a vocab of their own. Returns the vocab as a list,
+    the token ids of all playlists back to back, and the number of tokens in each playlist.
+    """
+    vocab = dict()
+    tokens = array('i')
+    lengths = array('q')
+    for playlist in playlists:
+        tokens.extend([vocab.setdefault(token, len(vocab)) for token in playlist])
+        lengths.append(len(playlist))
+    return list(vocab), np.frombuffer(tokens, dtype=np.int32), np.frombuffer(lengths, dtype=np.int64)
+
+def packStrings(strings):
+    """
+    Returns the UTF-8 bytes of 'strings' back to back as a uint8 array, and the int64 offset at
+    which each string starts in it plus a final end offset.
+    """
+    encoded = [string.encode('utf-8') for string in strings]
+    strtab = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    strtab_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=strtab_offsets[1:])
+    return strtab, strtab_offsets
+
+def unpackStrings(strtab, strtab_offsets):
+    """ Returns the list of strings packed by packStrings(). """
+    data = strtab.tobytes()
+    bounds = strtab_offsets.tolist()
+    return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+def binaryCorpusPrefix(data_folder, feature):
+    """ Returns the prefix under which the binary corpus of 'feature' in 'data_folder' is kept. """
+    folder_hash = hashlib.sha1(os.path.abspath(data_folder).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(BINARY_CORPUS_DIR, f"{feature}-{folder_hash}")
+
+def isBinaryCorpusFresh(data_folder, prefix):
+    """
+    Returns whether the binary corpus at 'prefix' exists and was built after the last change to
+    'data_folder' or any of its files.
+    """
+    try:
+        built = min(os.path.getmtime(prefix + suffix) for suffix in BINARY_CORPUS_SUFFIXES)
+    except FileNotFoundError:
+        return False
+    paths = Playlists(data_folder, None).paths()
+    return built >= max(os.path.getmtime(path) for path in [data_folder] + paths)
+
+def buildBinaryCorpus(data_folder, feature, out_prefix, workers=None):
+    """
+    Interns the 'feature' of every track in 'data_folder' and saves the packed corpus under
+    'out_prefix': the int32 token ids of all playlists back to back (.tokens.npy), the int64
+    offset at which each playlist starts in them plus a final end offset (.offsets.npy), and
+    the tokens packed by packStrings() (.vocab.npy and .vocab_offsets.npy), which unlike a
+    text file works for tokens containing newlines. Does nothing if an up to date corpus is
+    already there.
+
+    Each file is decoded and packed in its own process by a pool of 'workers' processes (one per
+    CPU by default). The results are merged in file order by mapping each file's ids onto the
+    combined vocab.
+    """
+    if isBinaryCorpusFresh(data_folder, out_prefix):
+        return
+    os.makedirs(os.path.dirname(out_prefix), exist_ok=True)
+    vocab = dict()
+    token_parts = [np.empty(0, dtype=np.int32)]
+    length_parts = [np.empty(0, dtype=np.int64)]
+    files = [ShardedPlaylists([path], feature) for path in Playlists(data_folder, feature).paths()]
+    with multiprocessing.Pool(workers or multiprocessing.cpu_count()) as pool:
+        for file_vocab, tokens, lengths in pool.imap(packPlaylists, files):
+            ids = np.array([vocab.setdefault(token, len(vocab)) for token in file_vocab], dtype=np.int32)
+            token_parts.append(ids[tokens])
+            length_parts.append(lengths)
+    lengths = np.concatenate(length_parts)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # Each file is written under a temporary name and then moved into place, so an interrupted
+    # build leaves at least one file older than the data and is redone next time
+    with open(out_prefix + '.tokens.npy.tmp', 'wb') as f:
+        np.save(f, np.concatenate(token_parts))
+    with open(out_prefix + '.offsets.npy.tmp', 'wb') as f:
+        np.save(f, offsets)
+    strtab, strtab_offsets = packStrings(vocab)
+    with open(out_prefix + '.vocab.npy.tmp', 'wb') as f:
+        np.save(f, strtab)
+    with open(out_prefix + '.vocab_offsets.npy.tmp', 'wb') as f:
+        np.save(f, strtab_offsets)
+    for suffix in BINARY_CORPUS_SUFFIXES:
+        os.replace(out_prefix + suffix + '.tmp', out_prefix + suffix)
+
+def loadBinaryCorpus(prefix):
+    """
+    Returns the memory-mapped (tokens, offsets) and the vocab list of a binary corpus. Raises a
+    ValueError if the token ids do not match the size of the vocab.
+    """
+    tokens = np.load(prefix + '.tokens.npy', mmap_mode='r')
+    offsets = np.load(prefix + '.offsets.npy', mmap_mode='r')
+    vocab = unpackStrings(np.load(prefix + '.vocab.npy'), np.load(prefix + '.vocab_offsets.npy'))
+    num_ids = int(tokens.max()) + 1 if len(tokens) else 0
+    if len(vocab) != num_ids:
+        raise ValueError(f"Binary corpus {prefix} has {len(vocab)} tokens in its vocab but {num_ids} token ids")
+    return tokens, offsets, vocab
+
+@numba.njit(cache=True)
+def emitLines(tokens, offsets, strtab, strtab_offsets, first, last):
+    """
+    Returns the UTF-8 bytes of playlists 'first' to 'last' (exclusive) as corpus file lines.
+    The bytes of token id i are strtab[strtab_offsets[i]:strtab_offsets[i + 1]].
+    """
+    size = offsets[last] - offsets[first] # One separator per token
+    for p in range(first, last):
+        if offsets[p] == offsets[p + 1]:
+            size += 1 # Newline for an empty playlist
+    for i in range(offsets[first], offsets[last]):
+        size += strtab_offsets[tokens[i] + 1] - strtab_offsets[tokens[i]]
+    out = np.empty(size, dtype=np.uint8)
+    pos = 0
+    for p in range(first, last):
+        if offsets[p] == offsets[p + 1]:
+            out[pos] = 10 # '\n'
+            pos += 1
+        for i in range(offsets[p], offsets[p + 1]):
+            start = strtab_offsets[tokens[i]]
+            end = strtab_offsets[tokens[i] + 1]
+            out[pos:pos + end - start] = strtab[start:end]
+            pos += end - start
+            out[pos] = 10 if i == offsets[p + 1] - 1 else 32 # '\n' or ' '
+            pos += 1
+    return out
+
+def getBinaryCorpus(playlists, workers=None):
+    """
+    Returns the prefix of the binary corpus of 'playlists'. Unless 'playlists' was created from
+    a binary corpus, its cached one is used, and built with 'workers' processes if missing or
+    out of date.
+    """
+    if playlists.binary is not None:
+        return playlists.binary
+    prefix = binaryCorpusPrefix(playlists.dirname, playlists.feature)
+    buildBinaryCorpus(playlists.dirname, playlists.feature, prefix, workers)
+    return prefix
+
+def materializeCorpus(playlists, output_file, workers=None):
+    """
+    Writes 'playlists' to 'output_file' with one playlist per line and space-separated tokens,
+    the format expected by Gensim's corpus_file argument. Returns the total number of tokens.
+
+    The lines are built by emitLines() from the binary corpus of 'playlists', rather than by
+    joining strings one playlist at a time. 'workers' is passed on to getBinaryCorpus().
+    """
+    tokens, offsets, vocab = loadBinaryCorpus(getBinaryCorpus(playlists, workers))
+    strtab, strtab_offsets = packStrings([encodeToken(token) for token in vocab])
+    num_playlists = len(offsets) - 1
+    with open(output_file, 'wb') as f:
+        for first in range(0, num_playlists, PLAYLISTS_PER_CHUNK):
+            last = min(first + PLAYLISTS_PER_CHUNK, num_playlists)
+            f.write(emitLines(tokens, offsets, strtab, strtab_offsets, first, last))
+    return len(tokens)
+
+def getCorpusFile(playlists, workers=None):
+    """
+    Returns (corpus_file, total_words) for 'playlists', materializing them into a temporary file
+    with 'workers' processes the first time. The file is removed when the program exits.
+    """
+    if playlists.corpus is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, corpus_file = tempfile.mkstemp(suffix='.txt', dir=CACHE_DIR)
+        os.close(fd)
+        atexit.register(removeFile, corpus_file)
+        print('\n\n\n>>> WRITING CORPUS FILE: ', time.ctime(time.time()), '\n\n\n')
+        total_words = materializeCorpus(playlists, corpus_file, workers)
+        playlists.corpus = (corpus_file, total_words)
+    return playlists.corpus
 
 
 
@@ -70,6 +374,16 @@ class MusicVecModelInterface(ABC):
         self.model = model
         self.models[name] = self
 
+        # int8 copy of the unit-normalized embeddings, a quarter of the size of the float32
+        # vectors, so that scoring an item against every other item reads far less memory.
+        # After this, queries only read the float32 vectors for rescoring. Computing the norms
+        # and the int8 copy reads every float32 row here, though, so a memory-mapped model is
+        # paged in in full when its wrapper is built rather than lazily
+        model.wv.fill_norms()
+        self.norms = model.wv.norms
+        self.Kq, self.Kq_scales = quantizeVectors(model.wv.vectors, self.norms)
+        self.index2key = model.wv.index_to_key
+
     @abstractmethod
     def get_item(self, prompt):
         """ Prompts the user for an item. Returns the item if provided, else False. """
@@ -112,26 +426,58 @@ class MusicVecModelInterface(ABC):
     
     def error_msg(self, e):
         return e
+
+    def normed_vectors(self, indices):
+        """ Returns the float32 unit-normalized vectors of the items at 'indices'. """
+        return self.model.wv.vectors[indices] / self.norms[indices, None]
+
+    def nearest(self, item, topn):
+        """
+        Returns the topn-most similar items to 'item' (excluding itself) as (item, similarity)
+        pairs, like most_similar() in Gensim. Raises a KeyError if 'item' is not in the model.
+
+        Every item is scored against the int8 embeddings, then the best RESCORE_FACTOR * (topn + 1)
+        candidates are rescored in float32. The returned similarities are exact, and so is the
+        ranking as long as the true top items are among those candidates.
+        """
+        index = self.model.wv.key_to_index[item]
+        q = self.normed_vectors([index])[0]
+        scores = quantizedScores(self.Kq, self.Kq_scales, q)
+        k = min(RESCORE_FACTOR * (topn + 1), len(scores)) # +1 in case 'item' itself is among the top
+        candidates = np.argpartition(scores, -k)[-k:]
+        exact = self.normed_vectors(candidates) @ q
+        order = np.argsort(-exact)
+        return [(self.index2key[candidates[j]], float(exact[j])) for j in order if candidates[j] != index][:topn]
+
+    def odd_one_out(self, item_list):
+        """
+        Returns the item in 'item_list' that is least similar to the items overall, like
+        doesnt_match() in Gensim. Raises a KeyError if any item is not in the model.
+        """
+        V = self.normed_vectors([self.model.wv.key_to_index[item] for item in item_list])
+        scores = (V @ V.T).sum(axis=1)
+        return item_list[int(np.argmin(scores))]
         
 class Artist2VecModel(MusicVecModelInterface):
     """ Class representing Artist2Vec model. """
     def __init__(self, model):
         super().__init__("Artist2Vec", model)
+        self.completions = sorted(model.wv.index_to_key) # Artist names offered by tab completion
 
     def get_item(self, prompt):
-        item = input(">>> " + prompt)
+        item = inputWithCompletions(">>> " + prompt, self.completions)
         if not item:
             return False
         return item
     
     def most_similar(self, item, topn):
         with handle_exceptions(self):
-            output = self.model.wv.most_similar(positive=[item], topn=topn)
-            printMostSimilarOutput(output)
+            output = self.nearest(item, topn)
+            printMostSimilarOutput([key for key, _ in output], [score for _, score in output])
     
     def doesnt_match(self, item_list):
         with handle_exceptions(self, multiple_items=True):
-            print(self.model.wv.doesnt_match(item_list) + " doesn't match the rest!")
+            print(self.odd_one_out(item_list) + " doesn't match the rest!")
     
     def similarity(self, item1, item2):
         with handle_exceptions(self, multiple_items=True):
@@ -141,59 +487,154 @@ class Artist2VecModel(MusicVecModelInterface):
     def arithmetic(self, positive_items, negative_items, topn):
         with handle_exceptions(self, multiple_items=True):
             output =  self.model.wv.most_similar(positive=positive_items, negative=negative_items, topn=topn)
-            printMostSimilarOutput(output)
+            printMostSimilarOutput([key for key, _ in output], [score for _, score in output])
 
 class Song2VecModel(MusicVecModelInterface):
     """ Class representing Song2Vec model. """
-    def __init__(self, model, sp):
+    TRACK_CACHE_SIZE = 4096 # Max number of Spotify track objects kept in memory
+    TRACKS_PER_REQUEST = 50 # Max number of tracks Spotify returns per sp.tracks() call
+    SEARCH_CACHE_SIZE = 512 # Max number of Spotify search results kept in memory
+    SEARCH_LIMIT = 10 # Number of tracks listed for each search
+    SEARCH_MARKET = 'US' # Market that search results are restricted to
+
+    def __init__(self, model, sp=None):
         super().__init__("Song2Vec", model)
-        self.sp = sp
+        self.sp = sp # Spotipy client, which may be set after construction (e.g. once logged in)
+        self.track_cache = OrderedDict() # Mapping of track URIs to Spotify track objects, in LRU order
+        self.search = lru_cache(maxsize=self.SEARCH_CACHE_SIZE)(self.search_tracks)
+
+        # Sorted track and artist names seen so far this session, offered by tab completion.
+        # Song2Vec only stores track URIs, so names are only known once Spotify returns them
+        self.track_names = []
+        self.artist_names = []
 
     def get_item(self, prompt):
         while True:
             query = ""
             print(">>> " + prompt)
-            track = input("   >>> Track choice (or empty if none): ")
-            artist = input("   >>> Artist choice (or empty if none): ")
+            track = inputWithCompletions("   >>> Track choice (or empty if none): ", self.track_names)
+            artist = inputWithCompletions("   >>> Artist choice (or empty if none): ", self.artist_names)
             if track:
                 query += "track:" + track + " "
             if artist:
                 query += "artist:" + artist
             if not query:
                 return False
-            output = self.sp.search(q=query, type="track")
+            output = self.search(" ".join(query.lower().split()))
+            self.remember_names(output['tracks']['items'])
             printSpotipyQueryOutput(output)
             choice = input(">>> Which track would you like to select? ")
             if choice:
-                return output['tracks']['items'][int(choice)]['uri']
+                track = output['tracks']['items'][int(choice)]
+                # Searching with a market can relink the track to a playable copy with a
+                # different URI, so use the original URI that the dataset would have
+                return track.get('linked_from', track)['uri']
+
+    def search_tracks(self, query):
+        """ Searches Spotify for tracks matching 'query'. Called through the cached self.search(). """
+        return self.sp.search(q=query, type="track", limit=self.SEARCH_LIMIT, market=self.SEARCH_MARKET)
     
     def error_msg(self, e):
         first_index = e.find("'")
         second_index = e.find("'", first_index + 1)
         track_uri = e[first_index + 1:second_index]
-        return getTrackNameAndArtists(self.sp.track(track_uri)) + e[second_index + 1:]
+        return self.get_track_names([track_uri])[0] + e[second_index + 1:]
+
+    def get_tracks(self, track_uris):
+        """
+        Returns the Spotify track objects for 'track_uris'. Tracks that are not already cached
+        are fetched together, TRACKS_PER_REQUEST at a time.
+        """
+        missing = [uri for uri in dict.fromkeys(track_uris) if uri not in self.track_cache]
+        for i in range(0, len(missing), self.TRACKS_PER_REQUEST):
+            batch = missing[i:i + self.TRACKS_PER_REQUEST]
+            fetched = self.sp.tracks(batch)['tracks']
+            self.track_cache.update(zip(batch, fetched))
+            self.remember_names(fetched)
+        tracks = []
+        for uri in track_uris:
+            self.track_cache.move_to_end(uri)
+            tracks.append(self.track_cache[uri])
+        while len(self.track_cache) > self.TRACK_CACHE_SIZE:
+            self.track_cache.popitem(last=False)
+        return tracks
+
+    def remember_names(self, tracks):
+        """ Adds the track and artist names of 'tracks' to the names offered by tab completion. """
+        for track in tracks:
+            if track is None: # Spotify returns None for unknown URIs
+                continue
+            insertName(self.track_names, track['name'])
+            for artist in track['artists']:
+                insertName(self.artist_names, artist['name'])
+
+    def get_track_names(self, track_uris):
+        """ Returns the "<track> by <artists>" name of each track in 'track_uris'. """
+        return [getTrackNameAndArtists(track) for track in self.get_tracks(track_uris)]
         
     def most_similar(self, item, topn):
         with handle_exceptions(self):
-            output = self.model.wv.most_similar(positive=[item], topn=topn)
-            func = lambda track_uri: getTrackNameAndArtists(self.sp.track(track_uri))
-            printMostSimilarOutput(output, func=func)
+            output = self.nearest(item, topn)
+            names = self.get_track_names([track_uri for track_uri, _ in output])
+            printMostSimilarOutput(names, [score for _, score in output])
 
     def doesnt_match(self, item_list):
         with handle_exceptions(self, multiple_items=True):
-            track_uri = self.model.wv.doesnt_match(item_list)
-            print(getTrackNameAndArtists(self.sp.track(track_uri)) + " doesn't match the rest!")
+            track_uri = self.odd_one_out(item_list)
+            print(self.get_track_names([track_uri])[0] + " doesn't match the rest!")
     
     def similarity(self, item1, item2):
         with handle_exceptions(self, multiple_items=True):
             output = self.model.wv.similarity(item1, item2)
-            print(f"{getTrackNameAndArtists(self.sp.track(item1))} and {getTrackNameAndArtists(self.sp.track(item2))} are {round(output * 100, 2)}% similar!")
+            name1, name2 = self.get_track_names([item1, item2])
+            print(f"{name1} and {name2} are {round(output * 100, 2)}% similar!")
 
     def arithmetic(self, positive_items, negative_items, topn):
         with handle_exceptions(self, multiple_items=True):
             output =  self.model.wv.most_similar(positive=positive_items, negative=negative_items, topn=topn)
-            func = lambda track_uri: getTrackNameAndArtists(self.sp.track(track_uri))
-            printMostSimilarOutput(output, func=func)
+            names = self.get_track_names([track_uri for track_uri, _ in output])
+            printMostSimilarOutput(names, [score for _, score in output])
+
+
+
+########## QUANTIZED VECTORS ##########
+# Number of rows quantized or scored at a time. At 100 dimensions a block's float32 copy is
+# ~800 KB, small enough to stay in L2 cache between being widened and multiplied. (Scoring
+# 2M x 100 vectors took 0.047s with 2048-row blocks, against 0.068s for a plain float32
+# matrix-vector product and 0.089s with 65536-row blocks.)
+QUANTIZED_BLOCK_ROWS = 2048
+
+# Number of candidates per requested result that are rescored exactly after the int8 pass
+RESCORE_FACTOR = 4
+
+def quantizeVectors(vectors, norms):
+    """
+    Returns an int8 copy of 'vectors' divided by their 'norms', with each row scaled so its
+    largest entry is +/-127, and the float32 factor of each row that undoes that scaling.
+    """
+    quantized = np.empty(vectors.shape, dtype=np.int8)
+    scales = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), QUANTIZED_BLOCK_ROWS):
+        end = start + QUANTIZED_BLOCK_ROWS
+        block = vectors[start:end] / norms[start:end, None]
+        peaks = np.abs(block).max(axis=1)
+        peaks[peaks == 0] = 1.0
+        quantized[start:end] = np.round(block * (127.0 / peaks)[:, None])
+        scales[start:end] = peaks / 127.0
+    return quantized, scales
+
+def quantizedScores(quantized, scales, q):
+    """
+    Returns the approximate dot products of the rows behind 'quantized' and 'scales' (from
+    quantizeVectors()) with the float32 vector 'q'. Each cache-sized block of int8 rows is
+    widened to float32 and passed to a BLAS matrix-vector product, so only int8 is read from
+    main memory.
+    """
+    scores = np.empty(len(quantized), dtype=np.float32)
+    for start in range(0, len(quantized), QUANTIZED_BLOCK_ROWS):
+        end = start + QUANTIZED_BLOCK_ROWS
+        np.dot(quantized[start:end].astype(np.float32), q, out=scores[start:end])
+    return scores * scales
 
 
 
@@ -205,85 +646,133 @@ class Callback(CallbackAny2Vec):
         self.epoch = 1
         self.training_loss = []
 
+    def on_epoch_begin(self, model):
+        # Reset Gensim's running loss at the start of each epoch instead of subtracting totals
+        model.running_training_loss = 0.0
+
     def on_epoch_end(self, model):
         loss = model.get_latest_training_loss()
-        if self.epoch == 1:
-            current_loss = loss
+        if model.workers > 1:
+            # When training from a corpus file, each worker thread overwrites the running loss
+            # with the total of its own part of the corpus, so this is only the share of
+            # whichever thread finished last, not the loss of the whole epoch
+            print(f"Loss after epoch {self.epoch} (last of {model.workers} worker threads only): {loss}")
         else:
-            current_loss = loss - self.loss_previous_step
-        print(f"Loss after epoch {self.epoch}: {current_loss}")
-        self.training_loss.append(current_loss)
+            print(f"Loss after epoch {self.epoch}: {loss}")
+        self.training_loss.append(loss)
         self.epoch += 1
-        self.loss_previous_step = loss
 
 
 
 ########## MODEL FUNCTIONS ##########
-def makeModel(playlists):
+def makeModel(playlists, workers=None):
     """
     Makes and returns a model on 'playlists', a Playlists object representing the
-    inputted playlist data.
+    inputted playlist data. 'workers' is the number of training threads, which defaults
+    to one per CPU since each thread reads its own part of the corpus file.
     """
+    workers = workers or multiprocessing.cpu_count()
+    corpus_file, _ = getCorpusFile(playlists, workers)
     print('\n\n\n>>> MAKING MODEL: ', time.ctime(time.time()), '\n\n\n')
-    model = Word2Vec(playlists,
+    model = Word2Vec(corpus_file=corpus_file,
                     window=10,
                     sg=0,
-                    workers=multiprocessing.cpu_count() - 1)
+                    workers=workers)
+    renameVocab(model, decodeToken)
     print('\n\n\n>>> FINISHED MAKING MODEL: ', time.ctime(time.time()))
     return model
 
 def buildVocab(model, playlists):
     """
-    Builds the vocab for 'model' using the 'playlists' data. Returns the model.
+    Builds the vocab for 'model' using the 'playlists' data. The token counts are taken from the
+    binary corpus of 'playlists' rather than by parsing the playlists again. Returns the model.
     """
     print('\n\n\n>>> BUILDING VOCAB: ', time.ctime(time.time()), '\n\n\n')
     logging.disable(logging.NOTSET) # Enable logging
-    model.build_vocab(playlists)
+    tokens, offsets, vocab = loadBinaryCorpus(getBinaryCorpus(playlists))
+    counts = np.bincount(tokens, minlength=len(vocab))
+    word_freq = dict(zip(vocab, counts.tolist()))
+    model.build_vocab_from_freq(word_freq, corpus_count=len(offsets) - 1)
     print('\n\n\n>>> FINISHED BUILDING VOCAB: ', time.ctime(time.time()))
     return model
 
 def trainModel(model, playlists, **kwargs):
     """"
-    Trains 'model' using the 'playlists' data. Lazily streams data from 'playlists'
-    one playlist at a time. Returns the trained model.
+    Trains 'model' using the 'playlists' data. The playlists are written to a corpus file
+    once, which Gensim's workers then read directly. Returns the trained model.
     """
+    corpus_file, total_words = getCorpusFile(playlists)
     print('\n\n\n>>> TRAINING MODEL: ', time.ctime(time.time()), '\n\n\n')
     logging.disable(logging.INFO) # Disable logging
     callback = Callback() # Instead, print out loss for each epoch
-    model.train(playlists,
-                total_examples = kwargs.get('total_examples', model.corpus_count),
-                epochs = 100,
-                compute_loss = True,
-                callbacks = [callback])
+    renameVocab(model, encodeToken) # Match the tokens in the corpus file
+    try:
+        model.train(corpus_file=corpus_file,
+                    total_examples = kwargs.get('total_examples', model.corpus_count),
+                    total_words = kwargs.get('total_words', total_words),
+                    epochs = 100,
+                    compute_loss = True,
+                    callbacks = [callback])
+    finally:
+        renameVocab(model, decodeToken) # Restore the keys even if training is interrupted
     print('\n\n\n>>> DONE TRAINING MODEL: ', time.ctime(time.time()))
     return model
 
 def saveModel(model, output_file):
     """"
-    Saves 'model' to 'output_file'. Assumes 'output_file' does not already exist.
+    Saves 'model' to 'output_file'. Raises a FileExistsError if 'output_file' or any of the
+    .npy files that would be written next to it already exist.
+
+    The output weights (syn1neg) and every array of model.wv, including the embedding vectors,
+    are written next to it as .npy files so that loadModel() can memory-map them instead of
+    unpickling them. (Gensim applies 'separately' to the top-level model only, and chooses
+    arrays of its sub-objects by 'sep_limit'.)
     """
     print('\n\n\n>>> SAVING MODEL: ', time.ctime(time.time()), '\n\n\n')
-    open(output_file, 'x')
-    with open(output_file, 'wb') as f:
-        dill.dump(model, f)
+    open(output_file, 'xb').close() # Claim the path atomically before writing anything
+    existing = glob.glob(glob.escape(output_file) + '.*.npy')
+    if existing:
+        os.remove(output_file)
+        raise FileExistsError(existing[0])
+    # Gensim only writes the .npy files when given a path; a file handle gets one inline pickle
+    # Gensim removes the separately saved arrays from the model (and model.wv) while saving, and
+    # does not always put them back if it is interrupted, so keep them to restore on failure
+    saved_objects = [model] + [value for value in vars(model).values() if hasattr(value, '_save_specials')]
+    saved_attributes = [(obj, vars(obj).copy()) for obj in saved_objects]
+    try:
+        model.save(output_file, separately=['syn1neg'], sep_limit=0)
+    except BaseException:
+        # Remove the claimed path and any partial .npy files (none existed before), so that
+        # saving to the same path can be retried
+        for path in [output_file] + glob.glob(glob.escape(output_file) + '.*.npy'):
+            removeFile(path)
+        for obj, attributes in saved_attributes:
+            vars(obj).update(attributes)
+        raise
     print('\n\n\n>>> DONE SAVING MODEL: ', time.ctime(time.time()))
 
-def loadModel(input_file, verbose=False):
-    """ Loads and returns model from 'input_file'. """
+def loadModel(input_file, verbose=False, mmap=None):
+    """
+    Loads and returns model from 'input_file'. If 'mmap' is given, arrays that were saved
+    separately from the model are memory-mapped with that mode and paged in from disk as they
+    are used. Only pass 'r' (read-only) for models that will not be trained further, since
+    training writes to the arrays; 'c' (copy-on-write) works for both.
+    """
     if verbose:
         print('\n\n\n>>> LOADING MODEL: ', time.ctime(time.time()), '\n\n\n')
         logging.disable(logging.NOTSET) # Enable logging
     else:
         logging.disable(logging.INFO) # Disable logging
-    model = Word2Vec.load(input_file)
+    model = Word2Vec.load(input_file, mmap=mmap)
     if verbose:
         print('\n\n\n>>> DONE LOADING MODEL: ', time.ctime(time.time()), '\n\n\n')
     return model
 
-def createEntireModel(data_folder, feature, output_file):
+def createEntireModel(data_folder, feature, output_file, workers=None):
     """
     Creates a full model on the data in 'data_folder', using the 'feature'
     as the parameter of interest, and saves the final model to 'output_file'.
+    'workers' sets the number of training threads (see makeModel()).
 
     Example function call for Artist2Vec:
         trainModel(
@@ -298,7 +787,7 @@ def createEntireModel(data_folder, feature, output_file):
             'models/song2vec.model')
     """
     playlists = Playlists(data_folder, feature)
-    initial_model = makeModel(playlists)
+    initial_model = makeModel(playlists, workers)
     vocab_model = buildVocab(initial_model, playlists)
     trained_model = trainModel(vocab_model, playlists)
     saveModel(trained_model, output_file)
@@ -306,14 +795,48 @@ def createEntireModel(data_folder, feature, output_file):
 
 
 ########## MISC HELPER FUNCTIONS ##########
-def printMostSimilarOutput(output, func=lambda x:x):
+MAX_COMPLETIONS = 100 # Max number of tab completion matches offered at once
+
+if readline is not None:
+    readline.set_completer_delims('') # Complete whole inputs, since names contain spaces
+    if 'libedit' in (readline.__doc__ or ''): # macOS ships libedit instead of GNU readline
+        readline.parse_and_bind('bind ^I rl_complete')
+    else:
+        readline.parse_and_bind('tab: complete')
+
+def inputWithCompletions(prompt, completions):
+    """
+    Prompts the user with input(), letting them tab-complete what they type against
+    'completions', a sorted list of strings.
+    """
+    if readline is None:
+        return input(prompt)
+    matches = []
+    def complete(text, state):
+        if state == 0:
+            start = bisect_left(completions, text)
+            end = bisect_left(completions, text + '\U0010ffff', start)
+            matches[:] = completions[start:min(end, start + MAX_COMPLETIONS)]
+        return matches[state] if state < len(matches) else None
+    readline.set_completer(complete)
+    try:
+        return input(prompt)
+    finally:
+        readline.set_completer(None)
+
+def insertName(names, name):
+    """ Inserts 'name' into the sorted list 'names' unless it is already there. """
+    i = bisect_left(names, name)
+    if i == len(names) or names[i] != name:
+        names.insert(i, name)
+
+def printMostSimilarOutput(labels, scores):
     """
-    Prints the 'output' from a call to most_similar() in a more readable format.
+    Prints the output of a most_similar() query in a more readable format, given the display
+    'labels' of the returned items and their similarity 'scores'.
     """
-    for i in range(len(output)):
-        item = func(output[i][0])
-        percentage = output[i][1]
-        print(f"\t({i + 1}) {item} - {round(percentage * 100, 2)}% similar")
+    for i, (label, score) in enumerate(zip(labels, scores)):
+        print(f"\t({i + 1}) {label} - {score * 100:.2f}% similar")
 
 @contextmanager
 def handle_exceptions(model, multiple_items=False):